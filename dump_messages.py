@@ -1,15 +1,27 @@
 import argparse
 import asyncio
+import functools
+import itertools
 import logging
 import signal
+import sqlite3
 from collections.abc import AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
 
-import aiosqlite
 import dotenv
-from aiohttp import ClientSession
+import orjson
+from aiohttp import ClientSession, TCPConnector
 from aiolimiter import AsyncLimiter
 from yarl import URL
 
+try:
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    # uvloop is optional (and unavailable on Windows); the stock loop works too.
+    pass
+
 # Argparse setup
 parser = argparse.ArgumentParser(description="Discord Media Scraper")
 parser.add_argument("--token", type=str, help="Discord token for authentication")
@@ -22,6 +34,51 @@ args = parser.parse_args()
 args.store_messages = True
 
 
+def _orjson_dumps(obj) -> str:
+    """aiohttp expects json_serialize to return str; orjson emits bytes."""
+    return orjson.dumps(obj).decode()
+
+
+# Guilds worth scraping; everything else the account is in gets skipped.
+_ALLOWED_GUILDS: frozenset[str] = frozenset({
+    "828457542984269824",
+    "868647576147214346",
+    "946184119681974312",
+    "981383507240714251",
+    "987930226510164048",
+    "1008185503675322438",
+    "1010957855781826581",
+    "1014622053447503963",
+    "1044790295709110302",
+    "1048365633370333257",
+    "1074390145949773935",
+    "1075901389483560970",
+    "1082723000018817084",
+    "1092654605508296796",
+    "1101492300569391155",
+    "1106578934096723989",
+    "1122129950829453394",
+    "1191181354176622643",
+    "1214770852445294675",
+    "1267923275523031181",
+    "1284154644972441672",
+    "1323109688098820116",
+    "1331814509534249051",
+})
+
+_API_URL = URL("https://discord.com/api")
+
+
+@functools.lru_cache(maxsize=512)
+def _guild_search_url(guild_id: str) -> URL:
+    return _API_URL / "v9/guilds" / guild_id / "messages/search/tabs"
+
+
+@functools.lru_cache(maxsize=512)
+def _guild_channels_url(guild_id: str) -> URL:
+    return _API_URL / "v9" / "guilds" / guild_id / "channels"
+
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
 logger = logging.getLogger(__name__)
 
@@ -36,15 +93,18 @@ class DiscordScraper:
         self.token = token
         self.user_id = user_id
         self.username = username
-        self.main_url = URL("https://discord.com/api")
+        self.main_url = _API_URL
         self.start_count = 0
         self.headers = {"Authorization": token, "Content-Type": "application/json"}
         self.session = None
         self.db = Database(args.db_path)
-        self.request_limiter = AsyncLimiter(5, 2)
+        # Global cap across all concurrent guild tasks; each guild task
+        # additionally gets its own AsyncLimiter(5, 2) in _process_one_guild.
+        self.request_limiter = AsyncLimiter(50, 2)
 
     async def async_init(self):
-        self.session = ClientSession()
+        connector = TCPConnector(limit=20, ttl_dns_cache=600, keepalive_timeout=75, enable_cleanup_closed=True)
+        self.session = ClientSession(connector=connector, headers=self.headers, json_serialize=_orjson_dumps)
         await self.db.async_init()
         await self.db.insert_scraping_account(self.user_id, self.username, self.token)
         await self.db.insert_guild("@me", "DMs")
@@ -54,9 +114,9 @@ class DiscordScraper:
         api_endpoint = self.main_url / "v9/users" / "@me" / "guilds"
 
         async with self.request_limiter:
-            async with self.session.get(api_endpoint, headers=self.headers) as response:
+            async with self.session.get(api_endpoint) as response:
                 if response.status == 200:
-                    guilds = await response.json()
+                    guilds = orjson.loads(await response.read())
                     for guild in guilds:
                         await self.db.insert_guild(guild.get("id"), guild.get("name"))
                         log(f"Found guild: {guild.get('id')} {guild.get('name')}", logging.INFO)
@@ -68,178 +128,224 @@ class DiscordScraper:
             guilds = [(guild_id, f"Retrying {guild_name}")]
         else:
             guilds = await self.db.get_guilds()
-        async with AsyncLimiter(10):
-            for guild in guilds:
-                await asyncio.sleep(0.5)
-                guild_id = guild[0]
-                guild_name = guild[1]
-                log(f"Getting channels for guild: {guild_id} {guild_name}", logging.INFO)
-                api_endpoint = self.main_url / "v9" / "guilds" / guild_id / "channels"
-
-                async with self.session.get(api_endpoint, headers=self.headers) as response:
-                    if response.status == 200:
-                        channels = await response.json()
-                        for channel in channels:
-                            if channel.get("type", -1) == 0:  # Text channel
-                                channel_id = channel.get("id", 0)
-                                channel_name = channel.get("name", "")
-                                is_nsfw = channel.get("nsfw", False)
-                                await self.db.insert_channel(channel_id, channel_name, guild_id, is_nsfw, False)
-                    else:
+        for guild in guilds:
+            guild_id = guild[0]
+            guild_name = guild[1]
+            log(f"Getting channels for guild: {guild_id} {guild_name}", logging.INFO)
+            api_endpoint = _guild_channels_url(guild_id)
+
+            # Retry 429s in place with exponential backoff instead of
+            # recursing, which stacked a frame per throttled attempt.
+            backoff = 5.0
+            for _attempt in range(5):
+                async with self.request_limiter:
+                    async with self.session.get(api_endpoint) as response:
+                        if response.status == 200:
+                            channels = orjson.loads(await response.read())
+                            for channel in channels:
+                                if channel.get("type", -1) == 0:  # Text channel
+                                    channel_id = channel.get("id", 0)
+                                    channel_name = channel.get("name", "")
+                                    is_nsfw = channel.get("nsfw", False)
+                                    await self.db.insert_channel(channel_id, channel_name, guild_id, is_nsfw, False)
+                            break
                         if response.status == 429:
-                            log("Rate limited, retrying in 5s...", logging.WARNING)
-                            await asyncio.sleep(5)
-                            await self.get_guild_channels(guild_id, guild_name)
-                        elif response.status == 403:
+                            log(f"Rate limited, retrying in {backoff:.0f}s...", logging.WARNING)
+                            await asyncio.sleep(backoff)
+                            backoff *= 2
+                            continue
+                        if response.status == 403:
                             log(f"Forbidden access to guild: {guild_id} {guild_name}", logging.WARNING)
                             await self.db.remove_guild(guild_id)
-                        elif response.status == 404:
+                            break
+                        if response.status == 404:
                             log(f"Guild not found: {guild_id} {guild_name}", logging.WARNING)
                             await self.db.remove_guild(guild_id)
-                        else:
-                            raise Exception(f"Failed to fetch channels for guild {guild_id}: {response.status}")
-
-    async def search_guild_media(self, guild, timestamp: str | None) -> AsyncGenerator[dict, None]:
+                            break
+                        raise Exception(f"Failed to fetch channels for guild {guild_id}: {response.status}")
+
+    async def _post_json(
+        self, url: URL, request_json: dict, limiter: AsyncLimiter | None = None
+    ) -> dict | None:
+        """POST one API request and decode the response, pacing on Discord's rate-limit headers.
+
+        Sleeps out the bucket's reset window *before* exhausting it, so 429s are
+        the exception rather than the steady state. Returns None when the
+        request was throttled and should be retried.
+        """
+        if limiter is not None:
+            await limiter.acquire()
+        async with self.request_limiter:
+            async with self.session.post(url, json=request_json) as response:
+                if response.status == 429:
+                    retry_after = float(response.headers.get("Retry-After", 5))
+                    log(f"Rate limited, retrying in {retry_after:.1f}s...", logging.WARNING)
+                    await asyncio.sleep(retry_after * 1.2)
+                    return None
+                data = orjson.loads(await response.read())
+                remaining = response.headers.get("X-RateLimit-Remaining")
+                reset_after = response.headers.get("X-RateLimit-Reset-After")
+        if "rate limited" in data.get("message", ""):
+            await asyncio.sleep(data.get("retry_after", 0) * 1.2)
+            return None
+        if remaining is not None and reset_after is not None and float(remaining) <= 1:
+            await asyncio.sleep(float(reset_after))
+        return data
+
+    async def search_guild_media(
+        self, guild, timestamp: str | None, limiter: AsyncLimiter | None = None
+    ) -> AsyncGenerator[dict, None]:
         log(f"Searching media in guild: {guild}", logging.INFO)
-        request_json = {
-            "include_nsfw": True,
-            "tabs": {
-                "media": {
-                    "sort_by": "timestamp",
-                    "sort_order": "asc",
-                    "cursor": {"timestamp": timestamp, "type": "timestamp"} if timestamp else None,
-                    "limit": 25,
-                }
-            },
-            "track_exact_total_hits": True,
-        }
-
-        request_url = self.main_url / "v9/guilds" / guild / "messages/search/tabs"
-
-        while True:
-            async with self.request_limiter:
-                async with self.session.post(request_url, headers=self.headers, json=request_json) as response:
-                    data = await response.json()
-                    if "rate limited" in data.get("message", ""):
-                        sleep_time = data.get("retry_after", 0)
-                        await asyncio.sleep(sleep_time * 1.2)
-                        continue
-                    media = data.get("tabs", {}).get("media", {})
-                    messages = media.get("messages", [])
-
-                    if messages:
-                        timestamp = media.get("cursor", {}).get("timestamp")
-                        yield messages, timestamp
-                    else:
-                        break
-
-                    if timestamp:
-                        request_json["tabs"]["media"]["cursor"] = {"timestamp": timestamp, "type": "timestamp"}
+        request_url = _guild_search_url(guild)
+        async for page in self._search_media(request_url, timestamp, limiter):
+            yield page
 
     async def search_dm_media(self, timestamp: str | None) -> AsyncGenerator[dict, None]:
-        request_json = {
-            "include_nsfw": True,
-            "tabs": {
-                "media": {
-                    "sort_by": "timestamp",
-                    "sort_order": "asc",
-                    "cursor": {"timestamp": timestamp, "type": "timestamp"} if timestamp else None,
-                    "limit": 25,
-                }
-            },
-            "track_exact_total_hits": True,
+        request_url = self.main_url / "v9/users" / "@me" / "messages/search/tabs"
+        async for page in self._search_media(request_url, timestamp):
+            yield page
+
+    async def _search_media(
+        self, request_url: URL, timestamp: str | None, limiter: AsyncLimiter | None = None
+    ) -> AsyncGenerator[dict, None]:
+        """Paginate a search endpoint, prefetching the next page while the caller processes the current one."""
+        cursor = {"timestamp": timestamp, "type": "timestamp"}
+        media_tab = {
+            "sort_by": "timestamp",
+            "sort_order": "asc",
+            "cursor": cursor if timestamp else None,
+            "limit": 25,
         }
+        request_json = {"include_nsfw": True, "tabs": {"media": media_tab}, "track_exact_total_hits": True}
 
-        request_url = self.main_url / "v9/users" / "@me" / "messages/search/tabs"
+        # The bounded queue lets the fetcher stay one page ahead of the
+        # consumer; the request_limiter still caps the absolute request rate.
+        queue = asyncio.Queue(maxsize=2)
 
-        while True:
-            async with self.request_limiter:
-                async with self.session.post(request_url, headers=self.headers, json=request_json) as response:
-                    data = await response.json()
-                    if "rate limited" in data.get("message", ""):
-                        sleep_time = data.get("retry_after", 0)
-                        await asyncio.sleep(sleep_time * 1.2)
+        async def fetch():
+            try:
+                while True:
+                    data = await self._post_json(request_url, request_json, limiter)
+                    if data is None:
                         continue
                     media = data.get("tabs", {}).get("media", {})
                     messages = media.get("messages", [])
 
-                    if messages:
-                        timestamp = media.get("cursor", {}).get("timestamp")
-                        yield messages, timestamp
-                    else:
+                    if not messages:
                         break
 
-                    if timestamp:
-                        request_json["tabs"]["media"]["cursor"] = {"timestamp": timestamp, "type": "timestamp"}
+                    cursor_timestamp = media.get("cursor", {}).get("timestamp")
+                    await queue.put((messages, cursor_timestamp))
+
+                    if cursor_timestamp:
+                        cursor["timestamp"] = cursor_timestamp
+                        media_tab["cursor"] = cursor
+            finally:
+                await queue.put(None)
+
+        fetcher = asyncio.create_task(fetch())
+        try:
+            while (page := await queue.get()) is not None:
+                yield page
+            await fetcher
+        finally:
+            if not fetcher.done():
+                fetcher.cancel()
 
     async def process_guild_messages(self):
         guilds = await self.db.get_guilds()
-        for guild in guilds:
+        semaphore = asyncio.Semaphore(8)
+        await asyncio.gather(*(self._process_one_guild(guild, semaphore) for guild in guilds))
+
+    async def _process_one_guild(self, guild, semaphore: asyncio.Semaphore):
+        async with semaphore:
             guild_id = guild[0]
             last_timestamp = guild[2] if not args.deep_scrape else None
-            async for messages, search_timestamp in self.search_guild_media(guild_id, last_timestamp):
+            # Discord rate-limits the search route per guild, so each task
+            # paces itself independently under the shared global limiter.
+            limiter = AsyncLimiter(5, 2)
+            async for messages, search_timestamp in self.search_guild_media(guild_id, last_timestamp, limiter):
+                message_rows, media_rows = [], []
+                users, channels = {}, {}
                 for message in messages:
                     message = message[0]
-                    await self.process_message(message, guild_id, search_timestamp)
+                    await self.process_message(
+                        message, guild_id, search_timestamp, message_rows, media_rows, users, channels
+                    )
+                await self.db.flush_page(message_rows, media_rows, list(users.values()), list(channels.values()))
+                await self.db.update_guild_timestamp(guild_id, search_timestamp, 1 if args.store_messages else 0)
 
     async def process_dms(self):
         guild = await self.db.get_guilds(get_dms=True)
         last_timestamp = guild[3] if args.store_messages else guild[2]
         last_timestamp = None if args.deep_scrape else last_timestamp
         async for messages, search_timestamp in self.search_dm_media(last_timestamp):
+            message_rows, media_rows = [], []
+            users, channels = {}, {}
             for message in messages:
                 message = message[0]
-                await self.process_message(message, "@me", search_timestamp)
+                await self.process_message(message, "@me", search_timestamp, message_rows, media_rows, users, channels)
+            await self.db.flush_page(message_rows, media_rows, list(users.values()), list(channels.values()))
+            await self.db.update_guild_timestamp("@me", search_timestamp, 1 if args.store_messages else 0)
 
-    async def process_message(self, message, guild_id: str, search_timestamp: str):
+    async def process_message(
+        self,
+        message,
+        guild_id: str,
+        search_timestamp: str,
+        message_rows: list[tuple],
+        media_rows: list[tuple],
+        users: dict[str, tuple],
+        channels: dict[str, tuple],
+    ):
+        # Bind the author dict once instead of building a throwaway {} per .get() chain.
+        author = message.get("author") or {}
         message_id = message.get("id", 0)
         content = message.get("content", "")
         channel_id = message.get("channel_id", 0)
-        user_id = message.get("author", {}).get("id", 0)
-        username = message.get("author", {}).get("username", "")
+        user_id = author.get("id", 0)
+        username = author.get("username", "")
         timestamp = message.get("timestamp", "")
         edited_timestamp = message.get("edited_timestamp", "")
         attachments = message.get("attachments", [])
         has_media = bool(attachments)
-        await self.db.insert_message(
-            message_id=message_id,
-            content=content,
-            timestamp=timestamp,
-            edited_timestamp=edited_timestamp,
-            user_id=user_id,
-            guild_id=guild_id,
-            channel_id=channel_id,
-            account_id=self.user_id,
-            search_timestamp=search_timestamp,
-            has_media=has_media,
+        message_rows.append(
+            (
+                message_id,
+                content,
+                timestamp,
+                edited_timestamp,
+                user_id,
+                guild_id,
+                channel_id,
+                self.user_id,
+                search_timestamp,
+                has_media,
+            )
         )
-        await self.db.insert_user(user_id, username, channel_id if guild_id == "@me" else None)
-        await self.db.update_guild_timestamp(guild_id, search_timestamp, 1 if args.store_messages else 0)
+        users[user_id] = (user_id, username, channel_id if guild_id == "@me" else None)
         if guild_id == "@me":
-            await self.db.insert_channel(channel_id, user_id, guild_id, False, True)
+            channels[channel_id] = (channel_id, user_id, True, False, guild_id)
+        account_id = self.user_id
         for attachment in attachments:
-            file_id = attachment.get("id", 0)
             url = attachment.get("url")
-            filename = attachment.get("filename")
-            size = attachment.get("size", 0)
-            content_type = attachment.get("content_type")
-            width = attachment.get("width", 0)
-            height = attachment.get("height", 0)
             if url:
-                await self.db.insert_media(
-                    file_id=file_id,
-                    url=url,
-                    filename=filename,
-                    size=size,
-                    content_type=content_type,
-                    width=width,
-                    height=height,
-                    message_id=message_id,
-                    user_id=user_id,
-                    guild_id=guild_id,
-                    channel_id=channel_id,
-                    account_id=self.user_id,
-                    search_timestamp=search_timestamp,
+                media_rows.append(
+                    (
+                        attachment.get("id", 0),
+                        url,
+                        attachment.get("filename"),
+                        attachment.get("size", 0),
+                        attachment.get("content_type"),
+                        attachment.get("width", 0),
+                        attachment.get("height", 0),
+                        message_id,
+                        user_id,
+                        guild_id,
+                        channel_id,
+                        account_id,
+                        search_timestamp,
+                    )
                 )
 
     async def get_new_count(self):
@@ -255,20 +361,64 @@ class DiscordScraper:
 
 
 class Database:
+    _SQL_INSERT_GUILD = """
+        INSERT INTO guilds (id, name) VALUES (?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name
+        WHERE name IS NOT excluded.name
+    """
+    _SQL_INSERT_USER = """
+        INSERT INTO users (id, name, channel_id) VALUES (?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name, channel_id = excluded.channel_id
+        WHERE name IS NOT excluded.name OR channel_id IS NOT excluded.channel_id
+    """
+    _SQL_INSERT_CHANNEL = """
+        INSERT INTO channels (id, name, is_dm, is_nsfw, guild_id) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name, is_dm = excluded.is_dm, is_nsfw = excluded.is_nsfw
+        WHERE name IS NOT excluded.name OR is_dm IS NOT excluded.is_dm OR is_nsfw IS NOT excluded.is_nsfw
+    """
+    _SQL_INSERT_ACCOUNT = """
+        INSERT INTO accounts (id, name, token) VALUES (?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name, token = excluded.token
+    """
+    _SQL_INSERT_MESSAGES = (
+        "INSERT INTO messages (id, content, timestamp, edited_timestamp, user_id, guild_id, channel_id,"
+        " account_id, search_timestamp, has_media) VALUES {placeholders}"
+        " ON CONFLICT(id) DO UPDATE SET content = excluded.content, has_media = excluded.has_media"
+    )
+    _SQL_INSERT_MEDIA = (
+        "INSERT INTO media (file_id, url, filename, size, content_type, width, height, message_id, user_id,"
+        " guild_id, channel_id, account_id, search_timestamp) VALUES {placeholders}"
+        " ON CONFLICT(file_id) DO UPDATE SET url = excluded.url"
+    )
+
     def __init__(self, db_path):
         self.db_path = db_path
         self.connection = None
-        self.cursor = None
-        self.lock = asyncio.Lock()
+        # Single worker thread: every statement for a batch crosses the
+        # executor boundary once instead of once per row as with aiosqlite.
+        self._executor = ThreadPoolExecutor(max_workers=1)
 
-    async def async_init(self):
-        self.connection = await aiosqlite.connect(self.db_path)
-        await self.connection.execute("PRAGMA journal_mode=WAL;")
-        self.cursor = await self.connection.cursor()
-        await self.create_tables()
+    async def _run(self, fn, *a):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *a)
 
-    async def create_tables(self):
-        await self.cursor.execute("""
+    async def async_init(self):
+        await self._run(self._connect)
+
+    def _connect(self):
+        self.connection = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        # Only takes effect on a fresh database; ignored (harmlessly) once
+        # the file has pages, so no need to gate it ourselves.
+        self.connection.execute("PRAGMA page_size=8192;")
+        self.connection.execute("PRAGMA journal_mode=WAL;")
+        self.connection.execute("PRAGMA synchronous=NORMAL;")
+        self.connection.execute("PRAGMA temp_store=MEMORY;")
+        self.connection.execute("PRAGMA mmap_size=268435456;")  # 256MB
+        self.connection.execute("PRAGMA cache_size=-65536;")  # 64MB
+        self.connection.execute("PRAGMA wal_autocheckpoint=10000;")
+        self._create_tables()
+
+    def _create_tables(self):
+        self.connection.execute("""
             CREATE TABLE IF NOT EXISTS accounts (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -276,7 +426,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        self.connection.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -284,7 +434,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        self.connection.execute("""
             CREATE TABLE IF NOT EXISTS guilds (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -293,7 +443,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        self.connection.execute("""
             CREATE TABLE IF NOT EXISTS channels (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -304,7 +454,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        self.connection.execute("""
             CREATE TABLE IF NOT EXISTS messages (
                 id TEXT PRIMARY KEY,
                 content TEXT,
@@ -323,7 +473,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        self.connection.execute("""
             CREATE TABLE IF NOT EXISTS media (
                 file_id TEXT PRIMARY KEY,
                 url TEXT,
@@ -346,196 +496,111 @@ class Database:
             )
         """)
 
-        await self.connection.commit()
+        # Indexes covering the filter columns used by dump_to_cdl.py, so its
+        # per-user queries are index scans instead of full table scans.
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_media_message ON media(message_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_media_content_type ON media(content_type)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_messages_guild ON messages(guild_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_channels_guild ON channels(guild_id)")
+        self.connection.execute("ANALYZE")
 
     async def insert_guild(self, guild_id: str, name: str):
-        async with self.lock:
-            await self.cursor.execute(
-                """
-                INSERT OR IGNORE INTO guilds (id, name) VALUES (?, ?)
-                ON CONFLICT(id) DO UPDATE SET name = excluded.name
-                """,
-                (guild_id, name),
-            )
-            await self.connection.commit()
-
-    async def insert_user(self, user_id: str, username: str, channel_id: str | None = None):
-        async with self.lock:
-            await self.cursor.execute(
-                """
-                INSERT OR IGNORE INTO users (id, name, channel_id) VALUES (?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET name = excluded.name, channel_id = excluded.channel_id
-                """,
-                (user_id, username, channel_id),
-            )
-            await self.connection.commit()
+        await self._run(self.connection.execute, self._SQL_INSERT_GUILD, (guild_id, name))
 
     async def insert_channel(
         self, channel_id: str, name: str, guild_id: str, is_nsfw: bool = False, is_dm: bool = False
     ):
-        async with self.lock:
-            await self.cursor.execute(
-                """
-                INSERT OR IGNORE INTO channels (id, name, is_dm, is_nsfw, guild_id) VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET name = excluded.name, is_dm = excluded.is_dm, is_nsfw = excluded.is_nsfw
-                """,
-                (channel_id, name, is_dm, is_nsfw, guild_id),
-            )
-            await self.connection.commit()
+        await self._run(self.connection.execute, self._SQL_INSERT_CHANNEL, (channel_id, name, is_dm, is_nsfw, guild_id))
 
     async def insert_scraping_account(self, user_id: str, username: str, token: str):
-        async with self.lock:
-            await self.cursor.execute(
-                """
-                INSERT OR IGNORE INTO accounts (id, name, token) VALUES (?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET name = excluded.name, token = excluded.token
-                """,
-                (user_id, username, token),
-            )
-            await self.connection.commit()
-
-    async def insert_message(
-        self,
-        message_id: str,
-        content: str,
-        timestamp: str,
-        edited_timestamp: str,
-        user_id: str,
-        guild_id: str,
-        channel_id: str,
-        account_id: str,
-        search_timestamp: str,
-        has_media: bool = False,
+        await self._run(self.connection.execute, self._SQL_INSERT_ACCOUNT, (user_id, username, token))
+
+    def _insert_many(self, sql_template: str, columns: int, rows: list[tuple]):
+        # Chunk multi-row VALUES statements to stay under SQLite's 999-variable limit.
+        chunk_size = 999 // columns
+        placeholder = "(" + ", ".join("?" * columns) + ")"
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            sql = sql_template.format(placeholders=",".join([placeholder] * len(chunk)))
+            self.connection.execute(sql, tuple(itertools.chain.from_iterable(chunk)))
+
+    def _flush_page(
+        self, message_rows: list[tuple], media_rows: list[tuple], user_rows: list[tuple], channel_rows: list[tuple]
     ):
-        async with self.lock:
-            await self.cursor.execute(
-                """
-                INSERT INTO messages (id, content, timestamp, edited_timestamp, user_id, guild_id, channel_id, account_id, search_timestamp, has_media)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET content = excluded.content, has_media = excluded.has_media
-            """,
-                (
-                    message_id,
-                    content,
-                    timestamp,
-                    edited_timestamp,
-                    user_id,
-                    guild_id,
-                    channel_id,
-                    account_id,
-                    search_timestamp,
-                    has_media,
-                ),
-            )
-            await self.connection.commit()
-
-    async def insert_media(
-        self,
-        file_id: str,
-        url: str,
-        filename: str,
-        size: int,
-        content_type: str,
-        width: int,
-        height: int,
-        message_id: str,
-        user_id: str,
-        guild_id: str,
-        channel_id: str,
-        account_id: str,
-        search_timestamp: str,
+        self.connection.execute("BEGIN")
+        if user_rows:
+            self.connection.executemany(self._SQL_INSERT_USER, user_rows)
+        if channel_rows:
+            self.connection.executemany(self._SQL_INSERT_CHANNEL, channel_rows)
+        if message_rows:
+            self._insert_many(self._SQL_INSERT_MESSAGES, 10, message_rows)
+        if media_rows:
+            self._insert_many(self._SQL_INSERT_MEDIA, 13, media_rows)
+        self.connection.commit()
+
+    async def flush_page(
+        self, message_rows: list[tuple], media_rows: list[tuple], user_rows: list[tuple], channel_rows: list[tuple]
     ):
-        async with self.lock:
-            await self.cursor.execute(
-                """
-                INSERT INTO media (file_id, url, filename, size, content_type, width, height, message_id, user_id, guild_id, channel_id, account_id, search_timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(file_id) DO UPDATE SET url = excluded.url
-            """,
-                (file_id, url, filename, size, content_type, width, height, message_id, user_id, guild_id, channel_id, account_id, search_timestamp),
-            )
-            await self.connection.commit()
+        """Write one page of search results in a single transaction and executor hop."""
+        if not (message_rows or media_rows or user_rows or channel_rows):
+            return
+        await self._run(self._flush_page, message_rows, media_rows, user_rows, channel_rows)
 
     async def update_guild_timestamp(self, guild_id: str, timestamp: str, type: int):
-        async with self.lock:
-            if type == 0:  # Media timestamp
-                await self.cursor.execute(
-                    "UPDATE guilds SET last_media_timestamp = ? WHERE id = ?", (timestamp, guild_id)
-                )
-            else:  # Message timestamp
-                await self.cursor.execute(
-                    "UPDATE guilds SET last_message_timestamp = ? WHERE id = ?", (timestamp, guild_id)
-                )
-            await self.connection.commit()
+        if type == 0:  # Media timestamp
+            await self._run(
+                self.connection.execute, "UPDATE guilds SET last_media_timestamp = ? WHERE id = ?", (timestamp, guild_id)
+            )
+        else:  # Message timestamp
+            await self._run(
+                self.connection.execute, "UPDATE guilds SET last_message_timestamp = ? WHERE id = ?", (timestamp, guild_id)
+            )
 
-    async def get_guilds(self, get_dms: bool = False) -> list[tuple[str, str]]:
+    def _get_guilds(self, get_dms: bool = False):
         if get_dms:
-            await self.cursor.execute("SELECT * FROM guilds WHERE id = '@me'")
-            return await self.cursor.fetchone()
-        await self.cursor.execute("SELECT * FROM guilds")
-        guilds = await self.cursor.fetchall()
-        guilds2 = [
-            guild
-            for guild in guilds
-            if guild[0]
-            in (
-                "828457542984269824",
-                "868647576147214346",
-                "946184119681974312",
-                "981383507240714251",
-                "987930226510164048",
-                "1008185503675322438",
-                "1010957855781826581",
-                "1014622053447503963",
-                "1044790295709110302",
-                "1048365633370333257",
-                "1074390145949773935",
-                "1075901389483560970",
-                "1082723000018817084",
-                "1092654605508296796",
-                "1101492300569391155",
-                "1106578934096723989",
-                "1122129950829453394",
-                "1191181354176622643",
-                "1214770852445294675",
-                "1267923275523031181",
-                "1284154644972441672",
-                "1323109688098820116",
-                "1331814509534249051",
-            )
-        ]
-        return [guild for guild in guilds2 if guild[0] not in ("@me",)]
+            return self.connection.execute("SELECT * FROM guilds WHERE id = '@me'").fetchone()
+        placeholders = ",".join("?" * len(_ALLOWED_GUILDS))
+        return self.connection.execute(
+            f"SELECT * FROM guilds WHERE id IN ({placeholders})", tuple(_ALLOWED_GUILDS)
+        ).fetchall()
 
-    async def get_channels(self, guild_id: str | None, is_nsfw: bool = False):
+    async def get_guilds(self, get_dms: bool = False) -> list[tuple[str, str]]:
+        return await self._run(self._get_guilds, get_dms)
+
+    def _get_channels(self, guild_id: str | None, is_nsfw: bool = False):
         if guild_id:
-            await self.cursor.execute("SELECT * FROM channels WHERE guild_id = ? AND is_nsfw = ?", (guild_id, is_nsfw))
-        else:
-            await self.cursor.execute("SELECT * FROM channels WHERE is_nsfw = ?", (is_nsfw,))
-        return await self.cursor.fetchall()
+            return self.connection.execute(
+                "SELECT * FROM channels WHERE guild_id = ? AND is_nsfw = ?", (guild_id, is_nsfw)
+            ).fetchall()
+        return self.connection.execute("SELECT * FROM channels WHERE is_nsfw = ?", (is_nsfw,)).fetchall()
+
+    async def get_channels(self, guild_id: str | None, is_nsfw: bool = False):
+        return await self._run(self._get_channels, guild_id, is_nsfw)
 
     async def remove_guild(self, guild_id: str):
-        async with self.lock:
-            await self.cursor.execute("DELETE FROM guilds WHERE id = ?", (guild_id,))
-            await self.connection.commit()
+        await self._run(self.connection.execute, "DELETE FROM guilds WHERE id = ?", (guild_id,))
 
-    async def count_media(self):
-        await self.cursor.execute("SELECT COUNT(*) FROM media")
-        count = await self.cursor.fetchone()
+    def _count_media(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM media").fetchone()
         return count[0] if count else 0
 
+    async def count_media(self):
+        return await self._run(self._count_media)
+
     async def close(self):
         if self.connection:
-            await self.cursor.close()
-            await self.connection.close()
+            await self._run(self.connection.close)
+        self._executor.shutdown()
 
 
 async def main():
     try:
-        dotenv_path = dotenv.find_dotenv()
-        dotenv.load_dotenv(dotenv_path)
-        token = str(args.token) if args.token else str(dotenv.get_key(dotenv_path, "DISCORD_TOKEN"))
-        user_id = str(args.user_id) if args.user_id else str(dotenv.get_key(dotenv_path, "DISCORD_USER_ID"))
-        username = str(args.username) if args.username else str(dotenv.get_key(dotenv_path, "DISCORD_USERNAME"))
+        env = dotenv.dotenv_values(dotenv.find_dotenv())
+        token = args.token or env.get("DISCORD_TOKEN")
+        user_id = args.user_id or env.get("DISCORD_USER_ID")
+        username = args.username or env.get("DISCORD_USERNAME")
         if not token or not user_id or not username:
             log("Missing required arguments: --token, --user-id, --username", logging.ERROR)
             return
@@ -1,14 +1,26 @@
 import argparse
 import asyncio
+import contextlib
+import functools
+import itertools
 import logging
 from collections.abc import AsyncGenerator
 
 import aiosqlite
 import dotenv
-from aiohttp import ClientSession
+import orjson
+from aiohttp import ClientSession, TCPConnector
 from aiolimiter import AsyncLimiter
 from yarl import URL
 
+try:
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    # uvloop is optional (and unavailable on Windows); the stock loop works too.
+    pass
+
 # Argparse setup
 parser = argparse.ArgumentParser(description="Discord Media Scraper")
 parser.add_argument("--token", type=str, help="Discord token for authentication")
@@ -22,10 +34,44 @@ args = parser.parse_args()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
 logger = logging.getLogger(__name__)
 
-
-def log(message: str, level: int = logging.INFO):
-    """Log a message with the specified logging level."""
-    logger.log(level, message)
+# Guilds worth scraping; everything else the account is in gets skipped.
+_ALLOWED_GUILDS: frozenset[str] = frozenset({
+    "828457542984269824",
+    "868647576147214346",
+    "946184119681974312",
+    "981383507240714251",
+    "987930226510164048",
+    "1008185503675322438",
+    "1010957855781826581",
+    "1014622053447503963",
+    "1044790295709110302",
+    "1048365633370333257",
+    "1074390145949773935",
+    "1075901389483560970",
+    "1082723000018817084",
+    "1092654605508296796",
+    "1101492300569391155",
+    "1106578934096723989",
+    "1122129950829453394",
+    "1191181354176622643",
+    "1214770852445294675",
+    "1267923275523031181",
+    "1284154644972441672",
+    "1323109688098820116",
+    "1331814509534249051",
+})
+
+_API_URL = URL("https://discord.com/api")
+
+
+@functools.lru_cache(maxsize=512)
+def _guild_search_url(guild_id: str) -> URL:
+    return _API_URL / "v9/guilds" / guild_id / "messages/search/tabs"
+
+
+@functools.lru_cache(maxsize=512)
+def _guild_channels_url(guild_id: str) -> URL:
+    return _API_URL / "v9" / "guilds" / guild_id / "channels"
 
 
 class DiscordScraper:
@@ -33,30 +79,131 @@ class DiscordScraper:
         self.token = token
         self.user_id = user_id
         self.username = username
-        self.main_url = URL("https://discord.com/api")
+        self.main_url = _API_URL
         self.start_count = 0
         self.headers = {"Authorization": token, "Content-Type": "application/json"}
         self.session = None
         self.db = Database(args.db_path)
         self.request_limiter = AsyncLimiter(5, 2)
+        self._media_buffer: list[tuple] = []
+        self._user_buffer: list[tuple] = []
+        self._channel_buffer: list[tuple] = []
+        # Resume cursors ride the same batches as their pages' rows, so a
+        # cursor is never durable before the attachments it stands for.
+        self._timestamp_buffer: list[tuple] = []
+        # IDs already written this run (or present from a previous one);
+        # lets process_message skip re-upserting the same user/DM channel
+        # for every attachment they posted.
+        self._known_users: set[str] = set()
+        self._known_channels: set[str] = set()
+        # file_ids already buffered this run (plus, on incremental scrapes,
+        # those stored by previous runs); repeat scans mostly re-see the
+        # same attachments, so this short-circuits the queue entirely.
+        self._seen_file_ids: set[str] = set()
+        # Full buffers are handed to a background writer task, so HTTP
+        # pagination never waits on a SQLite commit. The small maxsize
+        # bounds memory if the writer falls behind.
+        self._write_queue: asyncio.Queue[tuple | None] = asyncio.Queue(maxsize=8)
+        self._writer_task = None
+
+    # Flush the row buffers once this many media rows have accumulated, so
+    # each commit (and its fsync) covers many attachments instead of one.
+    FLUSH_THRESHOLD = 1000
+
+    def _check_writer(self):
+        # A SQLite error kills the writer task; without this check the
+        # producers would block on a full queue (and _drain_writes on
+        # join()) forever instead of surfacing the error.
+        if self._writer_task is not None and self._writer_task.done():
+            exc = self._writer_task.exception()
+            if exc is not None:
+                raise exc
+            raise RuntimeError("database writer task exited before the scrape finished")
+
+    async def _race_writer(self, op_coro):
+        # Checking the writer before blocking is not enough: it can die
+        # while a producer sits in put() on a full queue (or in join())
+        # with nobody left to re-check. Race the wait against the writer
+        # task itself; if the writer finishes first, the op is cancelled
+        # and _check_writer raises its failure instead of deadlocking.
+        op = asyncio.ensure_future(op_coro)
+        await asyncio.wait({op, self._writer_task}, return_when=asyncio.FIRST_COMPLETED)
+        if not op.done():
+            op.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await op
+        self._check_writer()
+
+    async def _flush_buffers(self):
+        if not (self._user_buffer or self._channel_buffer or self._media_buffer or self._timestamp_buffer):
+            return
+        batch = (self._user_buffer, self._channel_buffer, self._media_buffer, self._timestamp_buffer)
+        self._user_buffer, self._channel_buffer, self._media_buffer, self._timestamp_buffer = [], [], [], []
+        await self._race_writer(self._write_queue.put(batch))
+
+    async def _drain_writes(self):
+        await self._flush_buffers()
+        # join() alone can also hang on writer death: task_done() runs in
+        # the writer's finally, so unconsumed batches never count down.
+        await self._race_writer(self._write_queue.join())
+
+    async def _writer_loop(self):
+        while True:
+            batch = await self._write_queue.get()
+            try:
+                if batch is None:
+                    break
+                user_rows, channel_rows, media_rows, timestamp_rows = batch
+                await self.db.begin()
+                if user_rows:
+                    await self.db.insert_users_many(user_rows)
+                if channel_rows:
+                    await self.db.insert_channels_many(channel_rows)
+                if media_rows:
+                    await self.db.insert_media_many(media_rows)
+                # Cursors go last so they are never durable without their rows.
+                if timestamp_rows:
+                    await self.db.update_guild_timestamps_many(timestamp_rows)
+                # One commit (one fsync) covers the whole batch. Nothing else
+                # commits while the scrape runs, so the transaction stays
+                # atomic even though each statement awaits the connection.
+                await self.db.commit()
+            finally:
+                self._write_queue.task_done()
 
     async def async_init(self):
-        self.session = ClientSession()
+        # Every request hits the same host, so a pool of keep-alive
+        # connections amortizes TLS setup across the whole scrape.
+        connector = TCPConnector(
+            limit=64, limit_per_host=64, ttl_dns_cache=300, keepalive_timeout=60, enable_cleanup_closed=True
+        )
+        self.session = ClientSession(connector=connector, headers=self.headers)
         await self.db.async_init()
         await self.db.insert_scraping_account(self.user_id, self.username, self.token)
         await self.db.insert_guild("@me", "DMs")
+        self._known_users = await self.db.get_user_ids()
+        self._known_channels = await self.db.get_channel_ids()
+        # Deep scrapes start with an empty seen-set on purpose: re-seeing a
+        # stored attachment must reach the upsert so its expiring CDN url
+        # gets refreshed. Incremental scrapes only fetch past the resume
+        # cursor, so warming from the DB just dedups across restarts.
+        if not args.deep_scrape:
+            self._seen_file_ids = await self.db.get_media_file_ids()
         self.start_count = await self.db.count_media()
+        self._writer_task = asyncio.create_task(self._writer_loop())
 
     async def get_guilds(self) -> None:
         api_endpoint = self.main_url / "v9/users" / "@me" / "guilds"
 
         async with self.request_limiter:
-            async with self.session.get(api_endpoint, headers=self.headers) as response:
+            async with self.session.get(api_endpoint) as response:
                 if response.status == 200:
-                    guilds = await response.json()
+                    guilds = orjson.loads(await response.read())
+                    rows = []
                     for guild in guilds:
-                        await self.db.insert_guild(guild.get("id"), guild.get("name"))
-                        log(f"Found guild: {guild.get('id')} {guild.get('name')}", logging.INFO)
+                        rows.append((guild.get("id"), guild.get("name")))
+                        logger.info("Found guild: %s %s", guild.get("id"), guild.get("name"))
+                    await self.db.insert_guilds_many(rows)
                 else:
                     raise Exception(f"Failed to fetch guilds: {response.status}")
 
@@ -64,40 +211,57 @@ class DiscordScraper:
         if guild_id:
             guilds = [(guild_id, f"Retrying {guild_name}")]
         else:
-            guilds = await self.db.get_guilds()
-        async with AsyncLimiter(10):
+            guilds = [guild async for guild in self.db.iter_guilds()]
+        semaphore = asyncio.Semaphore(8)
+        async with asyncio.TaskGroup() as tg:
             for guild in guilds:
-                await asyncio.sleep(0.5)
-                guild_id = guild[0]
-                guild_name = guild[1]
-                log(f"Getting channels for guild: {guild_id} {guild_name}", logging.INFO)
-                api_endpoint = self.main_url / "v9" / "guilds" / guild_id / "channels"
-
-                async with self.session.get(api_endpoint, headers=self.headers) as response:
-                    if response.status == 200:
-                        channels = await response.json()
-                        for channel in channels:
-                            if channel.get("type", -1) == 0:  # Text channel
-                                channel_id = channel.get("id", 0)
-                                channel_name = channel.get("name", "")
-                                is_nsfw = channel.get("nsfw", False)
-                                await self.db.insert_channel(channel_id, channel_name, guild_id, is_nsfw, False)
-                    else:
+                tg.create_task(self._fetch_guild_channels(guild[0], guild[1], semaphore))
+
+    async def _fetch_guild_channels(self, guild_id: str, guild_name: str, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            logger.info("Getting channels for guild: %s %s", guild_id, guild_name)
+            api_endpoint = _guild_channels_url(guild_id)
+
+            # Retry 429s in place instead of recursing, which stacked a
+            # frame (and an open response) per throttled attempt.
+            for attempt in range(5):
+                async with self.request_limiter:
+                    async with self.session.get(api_endpoint) as response:
+                        if response.status == 200:
+                            channels = orjson.loads(await response.read())
+                            for channel in channels:
+                                if channel.get("type", -1) == 0:  # Text channel
+                                    channel_id = channel.get("id", 0)
+                                    channel_name = channel.get("name", "")
+                                    is_nsfw = channel.get("nsfw", False)
+                                    await self.db.insert_channel(channel_id, channel_name, guild_id, is_nsfw, False)
+                            break
                         if response.status == 429:
-                            log("Rate limited, retrying in 5s...", logging.WARNING)
-                            await asyncio.sleep(5)
-                            await self.get_guild_channels(guild_id, guild_name)
-                        elif response.status == 403:
-                            log(f"Forbidden access to guild: {guild_id} {guild_name}", logging.WARNING)
+                            retry_after = float(response.headers.get("Retry-After", min(2**attempt * 5, 30)))
+                            logger.warning("Rate limited, retrying in %.1fs...", retry_after)
+                            await asyncio.sleep(retry_after)
+                            continue
+                        if response.status == 403:
+                            logger.warning("Forbidden access to guild: %s %s", guild_id, guild_name)
                             await self.db.remove_guild(guild_id)
-                        elif response.status == 404:
-                            log(f"Guild not found: {guild_id} {guild_name}", logging.WARNING)
+                            break
+                        if response.status == 404:
+                            logger.warning("Guild not found: %s %s", guild_id, guild_name)
                             await self.db.remove_guild(guild_id)
-                        else:
-                            raise Exception(f"Failed to fetch channels for guild {guild_id}: {response.status}")
+                            break
+                        raise Exception(f"Failed to fetch channels for guild {guild_id}: {response.status}")
+
+    async def _pace_rate_bucket(self, response) -> None:
+        """Sleep out a route bucket that is about to empty, so 429s stay rare."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset_after = response.headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None and float(remaining) <= 1:
+            bucket = response.headers.get("X-RateLimit-Bucket", "?")
+            logger.debug("Rate bucket %s exhausted, pausing %ss", bucket, reset_after)
+            await asyncio.sleep(float(reset_after))
 
     async def search_guild_media(self, guild, timestamp: str | None) -> AsyncGenerator[dict, None]:
-        log(f"Searching media in guild: {guild}", logging.INFO)
+        logger.info("Searching media in guild: %s", guild)
         request_json = {
             "include_nsfw": True,
             "tabs": {
@@ -112,16 +276,28 @@ class DiscordScraper:
             "track_exact_total_hits": True,
         }
 
-        request_url = self.main_url / "v9/guilds" / guild / "messages/search/tabs"
+        request_url = _guild_search_url(guild)
 
+        # Serialize with orjson and send the bytes directly; the session
+        # headers already carry Content-Type: application/json. The body is
+        # only re-dumped when the cursor moves, so throttled retries reuse it.
+        body = orjson.dumps(request_json)
         while True:
+            if timestamp:
+                request_json["tabs"]["media"]["cursor"] = {"timestamp": timestamp, "type": "timestamp"}
+                body = orjson.dumps(request_json)
             async with self.request_limiter:
-                async with self.session.post(request_url, headers=self.headers, json=request_json) as response:
-                    data = await response.json()
+                async with self.session.post(request_url, data=body) as response:
+                    if response.status == 429:
+                        retry_after = float(response.headers.get("Retry-After", 5))
+                        logger.warning("Rate limited, retrying in %.1fs...", retry_after)
+                        await asyncio.sleep(retry_after * 1.2)
+                        continue
+                    data = orjson.loads(await response.read())
                     if "rate limited" in data.get("message", ""):
-                        sleep_time = data.get("retry_after", 0)
-                        await asyncio.sleep(sleep_time * 1.2)
+                        await asyncio.sleep(data.get("retry_after", 0) * 1.2)
                         continue
+                    await self._pace_rate_bucket(response)
                     media = data.get("tabs", {}).get("media", {})
                     messages = media.get("messages", [])
 
@@ -131,9 +307,6 @@ class DiscordScraper:
                     else:
                         break
 
-                    if timestamp:
-                        request_json["tabs"]["media"]["cursor"] = {"timestamp": timestamp, "type": "timestamp"}
-
     async def search_dm_media(self, timestamp: str | None) -> AsyncGenerator[dict, None]:
         request_json = {
             "include_nsfw": True,
@@ -151,14 +324,26 @@ class DiscordScraper:
 
         request_url = self.main_url / "v9/users" / "@me" / "messages/search/tabs"
 
+        # Serialize with orjson and send the bytes directly; the session
+        # headers already carry Content-Type: application/json. The body is
+        # only re-dumped when the cursor moves, so throttled retries reuse it.
+        body = orjson.dumps(request_json)
         while True:
+            if timestamp:
+                request_json["tabs"]["media"]["cursor"] = {"timestamp": timestamp, "type": "timestamp"}
+                body = orjson.dumps(request_json)
             async with self.request_limiter:
-                async with self.session.post(request_url, headers=self.headers, json=request_json) as response:
-                    data = await response.json()
+                async with self.session.post(request_url, data=body) as response:
+                    if response.status == 429:
+                        retry_after = float(response.headers.get("Retry-After", 5))
+                        logger.warning("Rate limited, retrying in %.1fs...", retry_after)
+                        await asyncio.sleep(retry_after * 1.2)
+                        continue
+                    data = orjson.loads(await response.read())
                     if "rate limited" in data.get("message", ""):
-                        sleep_time = data.get("retry_after", 0)
-                        await asyncio.sleep(sleep_time * 1.2)
+                        await asyncio.sleep(data.get("retry_after", 0) * 1.2)
                         continue
+                    await self._pace_rate_bucket(response)
                     media = data.get("tabs", {}).get("media", {})
                     messages = media.get("messages", [])
 
@@ -168,60 +353,88 @@ class DiscordScraper:
                     else:
                         break
 
-                    if timestamp:
-                        request_json["tabs"]["media"]["cursor"] = {"timestamp": timestamp, "type": "timestamp"}
-
     async def process_guild_messages(self):
-        guilds = await self.db.get_guilds()
-        for guild in guilds:
+        # Overlap the paginated searches; the shared request_limiter still
+        # caps the absolute request rate across all guild tasks. Spawning
+        # tasks while the guild cursor streams lets the first searches
+        # start before the guild list is fully read.
+        semaphore = asyncio.Semaphore(8)
+        async with asyncio.TaskGroup() as tg:
+            async for guild in self.db.iter_guilds():
+                tg.create_task(self._process_one_guild(guild, semaphore))
+        await self._drain_writes()
+
+    async def _process_one_guild(self, guild, semaphore: asyncio.Semaphore):
+        async with semaphore:
             guild_id = guild[0]
             last_timestamp = guild[2] if not args.deep_scrape else None
             async for messages, search_timestamp in self.search_guild_media(guild_id, last_timestamp):
-                for message in messages:
-                    message = message[0]
+                # Each search hit is a list with the matched message first
+                # (Discord's grouped-hit shape may append context messages);
+                # unpack it in the loop header, discarding any extras.
+                for message, *_ in messages:
                     await self.process_message(message, guild_id, search_timestamp)
+                # search_timestamp is constant within a page, so one cursor
+                # row per page records the same progress as one per
+                # attachment. Buffered, not written: committing it here
+                # would interleave with the writer's transaction and could
+                # outrun rows still sitting in the media buffer.
+                self._timestamp_buffer.append((search_timestamp, guild_id))
 
     async def process_dms(self):
-        guild = await self.db.get_guilds(get_dms=True)
+        guild = await self.db.get_dm_guild()
         last_timestamp = guild[2] if not args.deep_scrape else None
         async for messages, search_timestamp in self.search_dm_media(last_timestamp):
-            for message in messages:
-                message = message[0]
+            for message, *_ in messages:
                 await self.process_message(message, "@me", search_timestamp)
+            self._timestamp_buffer.append((search_timestamp, "@me"))
+        await self._drain_writes()
 
     async def process_message(self, message, guild_id: str, search_timestamp: str):
+        # Message-level fields are the same for every attachment, so bind
+        # them once instead of re-walking the dicts per attachment; the
+        # author sub-dict in particular was rebuilt twice per iteration.
+        author = message.get("author") or {}
+        user_id = author.get("id")
+        username = author.get("username")
+        channel_id = message.get("channel_id")
+        timestamp = message.get("timestamp")
+        account_id = self.user_id
+        # Local alias: this set sees one membership test per attachment, and
+        # a local skips the attribute lookup each time. The buffers are NOT
+        # aliased because _flush_buffers rebinds them to fresh lists.
+        seen = self._seen_file_ids
         for attachment in message.get("attachments", []):
-            file_id = attachment.get("id", 0)
             url = attachment.get("url")
-            filename = attachment.get("filename")
-            size = attachment.get("size", 0)
-            content_type = attachment.get("content_type")
-            width = attachment.get("width", 0)
-            height = attachment.get("height", 0)
-            user_id = message.get("author", {}).get("id")
-            username = message.get("author", {}).get("username")
-            channel_id = message.get("channel_id")
-            timestamp = message.get("timestamp")
-            if url:
-                await self.db.insert_media(
-                    file_id=file_id,
-                    url=url,
-                    filename=filename,
-                    size=size,
-                    content_type=content_type,
-                    width=width,
-                    height=height,
-                    user_id=user_id,
-                    guild_id=guild_id,
-                    channel_id=channel_id,
-                    account_id=self.user_id,
-                    timestamp=timestamp,
-                    search_timestamp=search_timestamp,
-                )
-                await self.db.insert_user(user_id, username)
-                await self.db.update_guild_timestamp(guild_id, search_timestamp)
-                if guild_id == "@me":
-                    await self.db.insert_channel(channel_id, f"{username} DMs", guild_id, False, True)
+            if not url:
+                continue
+            file_id = attachment.get("id", 0)
+            if file_id in seen:
+                continue
+            seen.add(file_id)
+            self._media_buffer.append((
+                file_id,
+                url,
+                attachment.get("filename"),
+                attachment.get("size", 0),
+                attachment.get("content_type"),
+                attachment.get("width", 0),
+                attachment.get("height", 0),
+                user_id,
+                guild_id,
+                channel_id,
+                account_id,
+                timestamp,
+                search_timestamp,
+            ))
+            if user_id not in self._known_users:
+                self._user_buffer.append((user_id, username))
+                self._known_users.add(user_id)
+            if guild_id == "@me" and channel_id not in self._known_channels:
+                self._channel_buffer.append((channel_id, f"{username} DMs", True, False, guild_id))
+                self._known_channels.add(channel_id)
+            if len(self._media_buffer) >= self.FLUSH_THRESHOLD:
+                await self._flush_buffers()
 
     async def get_new_count(self):
         self.end_count = await self.db.count_media()
@@ -231,23 +444,62 @@ class DiscordScraper:
     async def close(self):
         if self.session:
             await self.session.close()
+        if self._writer_task:
+            # A crashed writer no longer consumes the queue; only hand it
+            # the shutdown sentinel if it is still alive. Awaiting the task
+            # re-raises whatever killed it.
+            if not self._writer_task.done():
+                await self._write_queue.put(None)
+            await self._writer_task
         if self.db:
             await self.db.close()
 
 
 class Database:
+    # SQL kept as constants so sqlite sees byte-identical statements on
+    # every call and its prepared-statement cache skips re-planning.
+    _SQL_INSERT_GUILD = """
+        INSERT INTO guilds (id, name) VALUES (?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name
+    """
+    _SQL_INSERT_USER = """
+        INSERT INTO users (id, name) VALUES (?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name
+    """
+    _SQL_INSERT_CHANNEL = """
+        INSERT INTO channels (id, name, is_dm, is_nsfw, guild_id) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name, is_dm = excluded.is_dm, is_nsfw = excluded.is_nsfw
+    """
+    _SQL_INSERT_ACCOUNT = """
+        INSERT INTO accounts (id, name, token) VALUES (?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET name = excluded.name, token = excluded.token
+    """
+    _SQL_INSERT_MEDIA = """
+        INSERT INTO media (file_id, url, filename, size, content_type, width, height, user_id, guild_id,
+                                    channel_id, account_id, timestamp, search_timestamp)
+        VALUES {placeholders}
+        ON CONFLICT(file_id) DO UPDATE SET url=excluded.url
+    """
+    _MEDIA_COLUMNS = 13
+
     def __init__(self, db_path):
         self.db_path = db_path
         self.connection = None
-        self.cursor = None
 
     async def async_init(self):
-        self.connection = await aiosqlite.connect(self.db_path)
-        self.cursor = await self.connection.cursor()
+        # Autocommit mode: rare single-statement writes commit themselves,
+        # and the batch paths open explicit BEGIN/COMMIT transactions.
+        self.connection = await aiosqlite.connect(self.db_path, isolation_level=None)
+        await self.connection.execute("PRAGMA journal_mode=WAL;")
+        await self.connection.execute("PRAGMA synchronous=NORMAL;")
+        await self.connection.execute("PRAGMA temp_store=MEMORY;")
+        await self.connection.execute("PRAGMA cache_size=-65536;")  # 64MB
+        await self.connection.execute("PRAGMA mmap_size=268435456;")  # 256MB
+        await self.connection.execute("PRAGMA busy_timeout=5000;")
         await self.create_tables()
 
     async def create_tables(self):
-        await self.cursor.execute("""
+        await self.connection.execute("""
             CREATE TABLE IF NOT EXISTS accounts (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -255,14 +507,14 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        await self.connection.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id TEXT PRIMARY KEY,
                 name TEXT
             )
         """)
 
-        await self.cursor.execute("""
+        await self.connection.execute("""
             CREATE TABLE IF NOT EXISTS guilds (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -270,7 +522,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        await self.connection.execute("""
             CREATE TABLE IF NOT EXISTS channels (
                 id TEXT PRIMARY KEY,
                 name TEXT,
@@ -281,7 +533,7 @@ class Database:
             )
         """)
 
-        await self.cursor.execute("""
+        await self.connection.execute("""
             CREATE TABLE IF NOT EXISTS media (
                 file_id TEXT PRIMARY KEY,
                 url TEXT,
@@ -303,152 +555,115 @@ class Database:
             )
         """)
 
+        # Covering indexes for the dump tool's per-user filters and for
+        # cursor-resumption lookups; without them every dump query scans
+        # the whole media table.
+        await self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_media_user ON media (user_id, guild_id, channel_id, content_type)"
+        )
+        await self.connection.execute("CREATE INDEX IF NOT EXISTS idx_channels_flags ON channels (id, is_dm, is_nsfw)")
+        await self.connection.execute("CREATE INDEX IF NOT EXISTS idx_media_search_ts ON media (guild_id, search_timestamp)")
+        await self.connection.execute("CREATE INDEX IF NOT EXISTS idx_media_guild_ts ON media (guild_id, timestamp)")
+        await self.connection.execute("CREATE INDEX IF NOT EXISTS idx_media_channel ON media (channel_id)")
+        await self.connection.execute("CREATE INDEX IF NOT EXISTS idx_channels_guild ON channels (guild_id)")
+
         await self.connection.commit()
 
     async def insert_guild(self, guild_id: str, name: str):
-        await self.cursor.execute(
-            """
-            INSERT OR IGNORE INTO guilds (id, name) VALUES (?, ?)
-            ON CONFLICT(id) DO UPDATE SET name = excluded.name
-            """,
-            (guild_id, name),
-        )
+        await self.connection.execute(self._SQL_INSERT_GUILD, (guild_id, name))
         await self.connection.commit()
 
-    async def insert_user(self, user_id: str, username: str):
-        await self.cursor.execute(
-            """
-            INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)
-            ON CONFLICT(id) DO UPDATE SET name = excluded.name
-            """,
-            (user_id, username),
-        )
+    async def insert_guilds_many(self, rows: list[tuple]):
+        await self.begin()
+        await self.connection.executemany(self._SQL_INSERT_GUILD, rows)
         await self.connection.commit()
 
+    async def insert_users_many(self, rows: list[tuple]):
+        await self.connection.executemany(self._SQL_INSERT_USER, rows)
+
     async def insert_channel(
         self, channel_id: str, name: str, guild_id: str, is_nsfw: bool = False, is_dm: bool = False
     ):
-        await self.cursor.execute(
-            """
-            INSERT OR IGNORE INTO channels (id, name, is_dm, is_nsfw, guild_id) VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(id) DO UPDATE SET name = excluded.name, is_dm = excluded.is_dm, is_nsfw = excluded.is_nsfw
-            """,
-            (channel_id, name, is_dm, is_nsfw, guild_id),
-        )
+        await self.connection.execute(self._SQL_INSERT_CHANNEL, (channel_id, name, is_dm, is_nsfw, guild_id))
         await self.connection.commit()
 
-    async def insert_scraping_account(self, user_id: str, username: str, token: str):
-        await self.cursor.execute(
-            """
-            INSERT OR IGNORE INTO accounts (id, name, token) VALUES (?, ?, ?)
-            ON CONFLICT(id) DO UPDATE SET name = excluded.name, token = excluded.token
-            """,
-            (user_id, username, token),
-        )
-        await self.connection.commit()
+    async def insert_channels_many(self, rows: list[tuple]):
+        await self.connection.executemany(self._SQL_INSERT_CHANNEL, rows)
 
-    async def insert_media(
-        self,
-        file_id: str,
-        url: str,
-        filename: str,
-        size: int,
-        content_type: str,
-        width: int,
-        height: int,
-        user_id: str,
-        guild_id: str,
-        channel_id: str,
-        account_id: str,
-        timestamp: str,
-        search_timestamp: str,
-    ):
-        await self.cursor.execute(
-            """
-            INSERT INTO media (file_id, url, filename, size, content_type, width, height, user_id, guild_id,
-                                        channel_id, account_id, timestamp, search_timestamp)
-            VALUES (?,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(file_id) DO UPDATE SET url=excluded.url
-        """,
-            (
-                file_id,
-                url,
-                filename,
-                size,
-                content_type,
-                width,
-                height,
-                user_id,
-                guild_id,
-                channel_id,
-                account_id,
-                timestamp,
-                search_timestamp,
-            ),
-        )
+    async def insert_scraping_account(self, user_id: str, username: str, token: str):
+        await self.connection.execute(self._SQL_INSERT_ACCOUNT, (user_id, username, token))
         await self.connection.commit()
 
-    async def update_guild_timestamp(self, guild_id: str, timestamp: str):
-        await self.cursor.execute("UPDATE guilds SET last_timestamp = ? WHERE id = ?", (timestamp, guild_id))
+    async def insert_media_many(self, rows: list[tuple]):
+        # Multi-row VALUES beats executemany for these wide rows: one
+        # statement per ~76 rows instead of one binding cycle per row.
+        # Chunked to stay under SQLite's 999-variable limit.
+        chunk_size = 999 // self._MEDIA_COLUMNS
+        placeholder = "(" + ", ".join("?" * self._MEDIA_COLUMNS) + ")"
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            sql = self._SQL_INSERT_MEDIA.format(placeholders=",".join([placeholder] * len(chunk)))
+            await self.connection.execute(sql, tuple(itertools.chain.from_iterable(chunk)))
+
+    async def begin(self):
+        await self.connection.execute("BEGIN")
+
+    async def commit(self):
         await self.connection.commit()
 
-    async def get_guilds(self, get_dms: bool = False) -> list[tuple[str, str]]:
-        if get_dms:
-            await self.cursor.execute("SELECT * FROM guilds WHERE id = '@me'")
-            return await self.cursor.fetchone()
-        await self.cursor.execute("SELECT * FROM guilds")
-        guilds = await self.cursor.fetchall()
-        guilds2 = [
-            guild
-            for guild in guilds
-            if guild[0]
-            in (
-                "828457542984269824",
-                "868647576147214346",
-                "946184119681974312",
-                "981383507240714251",
-                "987930226510164048",
-                "1008185503675322438",
-                "1010957855781826581",
-                "1014622053447503963",
-                "1044790295709110302",
-                "1048365633370333257",
-                "1074390145949773935",
-                "1075901389483560970",
-                "1082723000018817084",
-                "1092654605508296796",
-                "1101492300569391155",
-                "1106578934096723989",
-                "1122129950829453394",
-                "1191181354176622643",
-                "1214770852445294675",
-                "1267923275523031181",
-                "1284154644972441672",
-                "1323109688098820116",
-                "1331814509534249051",
-            )
-        ]
-        return [guild for guild in guilds2 if guild[0] not in ("@me",)]
+    async def update_guild_timestamps_many(self, rows: list[tuple]):
+        # No commit: only called from the writer's batch transaction, after
+        # the page rows each cursor stands for have been inserted.
+        await self.connection.executemany("UPDATE guilds SET last_timestamp = ? WHERE id = ?", rows)
+
+    async def get_dm_guild(self) -> tuple:
+        query = "SELECT id, name, last_timestamp FROM guilds WHERE id = '@me'"
+        async with self.connection.execute(query) as cursor:
+            return await cursor.fetchone()
+
+    async def iter_guilds(self) -> AsyncGenerator[tuple, None]:
+        """Yield allowed guild rows as they come off the cursor."""
+        # Filter in SQL so the VDBE never materializes skipped rows, and
+        # name the columns so schema additions cannot shift the tuple
+        # indices used by the processing code.
+        placeholders = ", ".join("?" * len(_ALLOWED_GUILDS))
+        query = f"SELECT id, name, last_timestamp FROM guilds WHERE id IN ({placeholders})"
+        async with self.connection.execute(query, tuple(_ALLOWED_GUILDS)) as cursor:
+            while rows := await cursor.fetchmany(256):
+                for row in rows:
+                    yield row
+
+    async def get_user_ids(self) -> set[str]:
+        async with self.connection.execute("SELECT id FROM users") as cursor:
+            return {row[0] for row in await cursor.fetchall()}
+
+    async def get_channel_ids(self) -> set[str]:
+        async with self.connection.execute("SELECT id FROM channels") as cursor:
+            return {row[0] for row in await cursor.fetchall()}
+
+    async def get_media_file_ids(self) -> set[str]:
+        async with self.connection.execute("SELECT file_id FROM media") as cursor:
+            return {row[0] for row in await cursor.fetchall()}
 
     async def get_channels(self, guild_id: str | None, is_nsfw: bool = False):
         if guild_id:
-            await self.cursor.execute("SELECT * FROM channels WHERE guild_id = ? AND is_nsfw = ?", (guild_id, is_nsfw))
+            query, params = "SELECT * FROM channels WHERE guild_id = ? AND is_nsfw = ?", (guild_id, is_nsfw)
         else:
-            await self.cursor.execute("SELECT * FROM channels WHERE is_nsfw = ?", (is_nsfw,))
-        return await self.cursor.fetchall()
+            query, params = "SELECT * FROM channels WHERE is_nsfw = ?", (is_nsfw,)
+        async with self.connection.execute(query, params) as cursor:
+            return await cursor.fetchall()
 
     async def remove_guild(self, guild_id: str):
-        await self.cursor.execute("DELETE FROM guilds WHERE id = ?", (guild_id,))
+        await self.connection.execute("DELETE FROM guilds WHERE id = ?", (guild_id,))
         await self.connection.commit()
 
     async def count_media(self):
-        await self.cursor.execute("SELECT COUNT(*) FROM media")
-        count = await self.cursor.fetchone()
+        async with self.connection.execute("SELECT COUNT(*) FROM media") as cursor:
+            count = await cursor.fetchone()
         return count[0] if count else 0
 
     async def close(self):
         if self.connection:
-            await self.cursor.close()
             await self.connection.close()
 
 
@@ -459,25 +674,25 @@ async def main():
     user_id = str(args.user_id) if args.user_id else str(dotenv.get_key(dotenv_path, "DISCORD_USER_ID"))
     username = str(args.username) if args.username else str(dotenv.get_key(dotenv_path, "DISCORD_USERNAME"))
     if not token or not user_id or not username:
-        log("Missing required arguments: --token, --user-id, --username", logging.ERROR)
+        logger.error("Missing required arguments: --token, --user-id, --username")
         return
 
     scraper = DiscordScraper(token, user_id, username)
     await scraper.async_init()
 
-    log("Getting Guilds...", logging.INFO)
+    logger.info("Getting Guilds...")
     await scraper.get_guilds()
-    # log("Getting Guild Channels...", logging.INFO)
+    # logger.info("Getting Guild Channels...")
     # await scraper.get_guild_channels(None, None)
-    log("Processing Server Media...", logging.INFO)
+    logger.info("Processing Server Media...")
     await scraper.process_guild_messages()
-    log("Processing DM Media...", logging.INFO)
+    logger.info("Processing DM Media...")
     await scraper.process_dms()
-    log("Done!", logging.INFO)
+    logger.info("Done!")
 
     new_count = await scraper.get_new_count()
     total_count = await scraper.db.count_media()
-    log(f"Found: {new_count} new media items.\nTotal: {total_count} media items.", logging.INFO)
+    logger.info("Found: %s new media items.\nTotal: %s media items.", new_count, total_count)
 
     await scraper.close()
 